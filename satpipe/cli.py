@@ -49,6 +49,9 @@ satpipe normalise  data/raw/msi/S2A_MSIL2A_20250715T051641_N0514_R019_T44RFQ.zar
 # Align everything to a 10 m grid
 satpipe align      data/processed/S2A_MSIL2A_20250715_norm.zarr \
                    data/processed/S2A_MSIL2A_20250715_align.zarr  --reference-band B04
+
+# Consolidate metadata once, after the final stage
+satpipe consolidate data/processed/S2A_MSIL2A_20250715_align.zarr
 """
 
 from __future__ import annotations
@@ -58,6 +61,7 @@ from pathlib import Path
 
 import click
 import mlflow
+import zarr
 
 from satpipe.ingest.msi import MSIIngestor
 from satpipe.ingest.sar import SARIngestor
@@ -76,7 +80,10 @@ def cli() -> None:  # noqa: D401
 @cli.command()
 @click.argument("scene_id")
 @click.option("--sensor", type=click.Choice(["msi", "sar"]), required=True)
-def ingest(scene_id: str, sensor: str) -> None:
+@click.option(
+    "--hash-data", is_flag=True, help="Fold band contents into the scene hash (slower)."
+)
+def ingest(scene_id: str, sensor: str, hash_data: bool) -> None:
     """Ingest a scene and store it as Zarr (tracked by DVC, logged in MLflow)."""
     safe_id = scene_id.replace("/", "_")
     zarr_path = f"data/raw/{sensor}/{safe_id}.zarr"
@@ -87,9 +94,9 @@ def ingest(scene_id: str, sensor: str) -> None:
         mlflow.log_params({"scene_id": scene_id, "sensor": sensor, "zarr_output": zarr_path})
 
         if sensor == "msi":
-            MSIIngestor().ingest(scene_id, zarr_path=zarr_path)
+            MSIIngestor().ingest(scene_id, zarr_path=zarr_path, hash_data=hash_data)
         else:
-            SARIngestor().ingest(scene_id, zarr_path=zarr_path)
+            SARIngestor().ingest(scene_id, zarr_path=zarr_path, hash_data=hash_data)
 
 
 # --------------------------------------------------------------------------- #
@@ -99,10 +106,11 @@ def ingest(scene_id: str, sensor: str) -> None:
 @click.argument("src", type=click.Path(exists=True, path_type=Path))
 @click.argument("dst", type=click.Path(path_type=Path))
 @click.option("--mode", type=click.Choice(["zscore", "minmax"]), default="zscore")
-def normalise(src: Path, dst: Path, mode: str) -> None:
+@click.option("--dtype", type=click.Choice(["float32", "int8"]), default="float32", show_default=True)
+def normalise(src: Path, dst: Path, mode: str, dtype: str) -> None:
     """Per-band statistical normalisation."""
     mlflow.set_tracking_uri("file:./mlruns")
-    normalise_zarr(src, dst, mode=mode)  # internal function handles MLflow run
+    normalise_zarr(src, dst, mode=mode, dtype=dtype)  # internal function handles MLflow run
 
 
 @cli.command()
@@ -115,5 +123,12 @@ def align(src: Path, dst: Path, reference_band: str) -> None:
     regrid_to_10m(src, dst, reference_band=reference_band)  # handles MLflow run
 
 
+@cli.command()
+@click.argument("path", type=click.Path(exists=True, path_type=Path))
+def consolidate(path: Path) -> None:
+    """Write consolidated Zarr metadata once (stages skip it by default)."""
+    zarr.consolidate_metadata(str(path))
+
+
 if __name__ == "__main__":
     cli()
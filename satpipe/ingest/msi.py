@@ -3,31 +3,40 @@
 INGESTION: Sentinel-2 L2A ingestion (COG or JP2) with on-the-fly resampling
 ----------------------------------------------------------------
 • Accepts scene_id  T35NND/2024/02/15   (leading “T” optional)
-• Searches Earth-Search STAC, falls back to most-recent ≤ date
-• Downloads 4×10 m bands (B02, B03, B04, B08)
-• If any band arrives at 20 m it is upsampled to the reference 10 m grid
-• Produces consolidated Zarr ready for DVC + MLflow
+• Searches Earth-Search STAC, falls back to most-recent ≤ date (results cached)
+• Fetches 4×10 m bands (B02, B03, B04, B08) – COGs are streamed via /vsicurl/,
+  JP2s are downloaded
+• If any band arrives at 20 m it is upsampled (bilinear) to the reference 10 m grid
+• Streams bands window-by-window into a Zarr store ready for DVC + MLflow
 """
 
 from __future__ import annotations
 
+import functools
 import os
 import tempfile
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import ExitStack
+from datetime import date as Date, datetime, timedelta, timezone
 from typing import Dict
 
-import numpy as np
+import diskcache
+import pystac
 import rasterio
-from rasterio.warp import Resampling, reproject
-import requests
-import xarray as xr
+from rasterio.vrt import WarpedVRT
+from rasterio.warp import Resampling
 from pystac_client import Client
-from tqdm import tqdm
 
 from satpipe.ingest.base import AbstractIngestor
-from satpipe.utils.io import write_zarr
+from satpipe.utils.io import (
+    copy_windowed, create_band, create_raster_store, finalise_raster_store,
+)
+from satpipe.utils.net import COG_ENV, RANGE_PARTS, download, http_session
 
 STAC_API = "https://earth-search.aws.element84.com/v1"
 COLLECTION = "sentinel-2-l2a"          # or 'sentinel-2-l2a-cogs'
+STAC_CACHE_DIR = os.path.expanduser("~/.cache/satpipe/stac")
+PUBLICATION_LAG = timedelta(days=7)    # L2A items can appear days after acquisition
 
 # logical → possible STAC asset keys
 BANDS: Dict[str, list[str]] = {
@@ -37,36 +46,67 @@ BANDS: Dict[str, list[str]] = {
     "B08": ["B08", "B08_JP2", "nir08", "nir08-jp2", "nir", "nir-jp2"],
 }
 
-
-def _download(url: str, dst: str, desc: str) -> None:
-    r = requests.get(url, stream=True, timeout=60)
-    r.raise_for_status()
-    total = int(r.headers.get("content-length", 0))
-    with open(dst, "wb") as f, tqdm(
-        total=total, unit="B", unit_scale=True, unit_divisor=1024,
-        desc=desc, leave=False
-    ) as bar:
-        for chunk in r.iter_content(chunk_size=8192):
-            f.write(chunk)
-            bar.update(len(chunk))
-
-
-def _resample(src_path: str, ref_profile: rasterio.profiles.Profile) -> np.ndarray:
-    """Reproject src band into the reference grid defined by ref_profile."""
-    with rasterio.open(src_path) as src:
-        src_arr = src.read(1)
-        dst_arr = np.empty((ref_profile["height"], ref_profile["width"]),
-                           dtype=src_arr.dtype)
-        reproject(
-            source=src_arr,
-            destination=dst_arr,
-            src_transform=src.transform,
-            src_crs=src.crs,
-            dst_transform=ref_profile["transform"],
-            dst_crs=ref_profile["crs"],
-            resampling=Resampling.nearest,
-        )
-    return dst_arr
+def _stac_search(tile_id: str, date: str) -> tuple[dict | None, bool]:
+    """Exact-date search then fallback to the most recent item ≤ date.
+
+    Returns ``(item, exact)`` where `exact` tells whether the date itself matched.
+    """
+    stac = Client.open(STAC_API)
+    items = list(
+        stac.search(
+            collections=[COLLECTION],
+            query={"s2:mgrs_tile": {"eq": tile_id}},
+            datetime=f"{date}T00:00:00Z/{date}T23:59:59Z",
+            max_items=1,
+        ).items()
+    )
+    if items:
+        return items[0].to_dict(), True
+    items = list(
+        stac.search(
+            collections=[COLLECTION],
+            query={"s2:mgrs_tile": {"eq": tile_id}},
+            datetime=f"../{date}T23:59:59Z",
+            sortby=[{"field": "properties.datetime", "direction": "desc"}],
+            max_items=1,
+        ).items()
+    )
+    return (items[0].to_dict() if items else None), False
+
+
+@functools.lru_cache(maxsize=256)
+def _stac_lookup(tile_id: str, date: Date) -> pystac.Item:
+    """Memoised STAC lookup – in-process LRU backed by an on-disk cache.
+
+    Exact-date hits are always persisted. A "most recent ≤ date" fallback is
+    persisted only once `date` is older than PUBLICATION_LAG – before that the
+    scene for `date` itself may still be published.
+    """
+    day = date.isoformat()
+    key = (STAC_API, COLLECTION, tile_id, day)
+    with diskcache.Cache(STAC_CACHE_DIR) as cache:
+        item = cache.get(key)
+        if item is None:
+            item, exact = _stac_search(tile_id, day)
+            settled = date <= datetime.now(timezone.utc).date() - PUBLICATION_LAG
+            if item is not None and (exact or settled):
+                cache.set(key, item)
+    if item is None:
+        raise ValueError(f"No Sentinel-2 scene for tile {tile_id} up to {date}")
+    return pystac.Item.from_dict(item)
+
+
+def _resample(src: rasterio.DatasetReader, ref_profile: rasterio.profiles.Profile) -> WarpedVRT:
+    """Bilinear view of `src` on the reference grid; GDAL warps block-by-block on read."""
+    return WarpedVRT(
+        src,
+        crs=ref_profile["crs"],
+        transform=ref_profile["transform"],
+        width=ref_profile["width"],
+        height=ref_profile["height"],
+        resampling=Resampling.bilinear,
+        num_threads=os.cpu_count() or 1,
+    )
 
 
 class MSIIngestor(AbstractIngestor):
@@ -74,71 +114,66 @@ class MSIIngestor(AbstractIngestor):
     def download(self, scene_id: str, **_) -> Dict[str, dict]:
         tile_raw, y, m, d = scene_id.split("/")
         tile_id = tile_raw.lstrip("Tt")
-        date    = f"{y}-{m}-{d}"
-
-        stac = Client.open(STAC_API)
-
-        # exact-date search then fallback
-        items = list(
-            stac.search(
-                collections=[COLLECTION],
-                query={"s2:mgrs_tile": {"eq": tile_id}},
-                datetime=f"{date}T00:00:00Z/{date}T23:59:59Z",
-                max_items=1,
-            ).items()
-        ) or list(
-            stac.search(
-                collections=[COLLECTION],
-                query={"s2:mgrs_tile": {"eq": tile_id}},
-                datetime=f"../{date}T23:59:59Z",
-                sortby=[{"field": "properties.datetime", "direction": "desc"}],
-                max_items=1,
-            ).items()
-        )
-        if not items:
-            raise ValueError(f"No Sentinel-2 scene for tile {tile_raw} up to {date}")
+        date    = Date(int(y), int(m), int(d))
 
-        item = items[0]
+        item = _stac_lookup(tile_id, date)
         tmp   = tempfile.mkdtemp(prefix=f"msi_{scene_id.replace('/','_')}_")
         files: Dict[str, str] = {}
+        hrefs: Dict[str, str] = {}
 
         for logical, aliases in BANDS.items():
             asset = next((item.assets[a] for a in aliases if a in item.assets), None)
             if not asset:
                 raise KeyError(f"{logical} missing, available={list(item.assets)}")
+            if asset.href.lower().endswith(".tif"):
+                # COG → to_zarr reads only the tiles it needs over HTTP ranges
+                files[logical] = f"/vsicurl/{asset.href}"
+                continue
             ext  = ".jp2" if asset.href.lower().endswith(".jp2") else ".tif"
-            path = os.path.join(tmp, f"{logical}{ext}")
-            _download(asset.href, path, logical)
-            files[logical] = path
+            files[logical] = os.path.join(tmp, f"{logical}{ext}")
+            hrefs[logical] = asset.href
+
+        # Bands are independent → fetch concurrently (network-bound, GIL released)
+        if hrefs:
+            session = http_session(pool_size=len(hrefs) * RANGE_PARTS)
+            with ThreadPoolExecutor(max_workers=len(hrefs)) as ex:
+                futures = [ex.submit(download, hrefs[b], files[b], b, session) for b in hrefs]
+                for f in as_completed(futures):
+                    f.result()
 
         return {"scene_id": scene_id, "files": files}
 
     # ------------------------------------------------------------------ #
-    def to_zarr(self, local_paths: Dict, zarr_path: str, **_) -> None:
-        # Use B02 as reference grid (10 m)
-        ref_path = local_paths["files"]["B02"]
-        with rasterio.open(ref_path) as ref:
-            ref_profile = ref.profile
-            ref_arr     = ref.read(1)
-            t           = ref.transform
-            x = np.arange(ref.width)  * t.a + t.c
-            y = np.arange(ref.height) * t.e + t.f
-            coords = {"x": x, "y": y}
-
-        data_arrays = [
-            xr.DataArray(ref_arr, dims=("y", "x"), coords=coords, name="B02")
-        ]
-
-        for band, path in local_paths["files"].items():
-            if band == "B02":
-                continue
-            with rasterio.open(path) as src:
-                if (src.width, src.height) == (ref_profile["width"], ref_profile["height"]):
-                    arr = src.read(1)
+    def to_zarr(
+        self,
+        local_paths: Dict,
+        zarr_path: str,
+        consolidated: bool = False,
+        hash_data: bool = False,
+        **_,
+    ) -> None:
+        # Open every source once; handles (and GDAL's block cache) are reused for
+        # the profile, the resampling VRT and the windowed copy.
+        with rasterio.Env(GDAL_CACHEMAX=512, **COG_ENV), ExitStack() as stack:
+            srcs = {
+                band: stack.enter_context(rasterio.open(path))
+                for band, path in local_paths["files"].items()
+            }
+            # Use B02 as reference grid (10 m)
+            ref_profile = srcs["B02"].profile
+            height, width = ref_profile["height"], ref_profile["width"]
+
+            # Grid is stored as CRS + affine (rioxarray convention), not as x/y arrays
+            store = create_raster_store(zarr_path, ref_profile["crs"], ref_profile["transform"])
+
+            for band, src in srcs.items():
+                z = create_band(store, band, (height, width), src.dtypes[0])
+                if (src.width, src.height) == (width, height):
+                    copy_windowed(src, z)
                 else:
-                    arr = _resample(path, ref_profile)
-            data_arrays.append(xr.DataArray(arr, dims=("y", "x"), coords=coords, name=band))
+                    with _resample(src, ref_profile) as vrt:
+                        copy_windowed(vrt, z)
 
-        ds = xr.merge(data_arrays)
-        ds.attrs["scene_id"] = local_paths["scene_id"]
-        write_zarr(ds, zarr_path)
+        finalise_raster_store(
+            store, zarr_path, local_paths["scene_id"], consolidated, hash_data
+        )
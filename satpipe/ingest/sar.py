@@ -1,33 +1,34 @@
 # satpipe/ingest/sar.py
 
 import os, requests, rasterio
-import xarray as xr
-import numpy as np
 from satpipe.ingest.base import AbstractIngestor
-from satpipe.utils.io import write_zarr
+from satpipe.utils.io import (
+    copy_windowed, create_band, create_raster_store, finalise_raster_store,
+)
+from satpipe.utils.net import COG_ENV, download, is_streamable_cog
 
 S1_BASE = "https://sentinel-s1-l1c.s3.amazonaws.com"
 
 class SARIngestor(AbstractIngestor):
     def download(self, scene_id: str, **kwargs):
         path = f"{S1_BASE}/{scene_id}/measurement/{scene_id}-VH.tiff"
-        r = requests.get(path)
-        if r.status_code != 200:
-            raise FileNotFoundError(f"Cannot fetch {path}")
+        # Tiled GeoTIFF with range support → read in place, no local copy
+        if is_streamable_cog(path):
+            return {"scene_id": scene_id, "files": {"VH": f"/vsicurl/{path}"}}
         os.makedirs(f"/tmp/{scene_id}", exist_ok=True)
         local_file = f"/tmp/{scene_id}/VH.tif"
-        with open(local_file, 'wb') as f:
-            f.write(r.content)
+        try:
+            download(path, local_file, "VH")
+        except requests.HTTPError as e:
+            raise FileNotFoundError(f"Cannot fetch {path}") from e
         return {"scene_id": scene_id, "files": {"VH": local_file}}
 
-    def to_zarr(self, local_paths, zarr_path, **kwargs):
-        with rasterio.open(local_paths["files"]["VH"]) as src:
-            arr = src.read(1)
-            transform = src.transform
-            x = np.arange(arr.shape[1]) * transform.a + transform.c
-            y = np.arange(arr.shape[0]) * transform.e + transform.f
-            ds = xr.Dataset({
-                "VH": xr.DataArray(arr, dims=["y", "x"], coords={"x": x, "y": y})
-            })
-            ds.attrs["scene_id"] = local_paths["scene_id"]
-            write_zarr(ds, zarr_path)
+    def to_zarr(self, local_paths, zarr_path, consolidated=False, hash_data=False, **kwargs):
+        with rasterio.Env(**COG_ENV), rasterio.open(local_paths["files"]["VH"]) as src:
+            # GRD measurements are GCP-referenced (no CRS) → keep the GCPs
+            store = create_raster_store(zarr_path, src.crs, src.transform, src.gcps)
+            vh = create_band(store, "VH", (src.height, src.width), src.dtypes[0])
+            copy_windowed(src, vh)
+        finalise_raster_store(
+            store, zarr_path, local_paths["scene_id"], consolidated, hash_data
+        )
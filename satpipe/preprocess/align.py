@@ -4,65 +4,154 @@
 from __future__ import annotations
 
 import logging
+import math
+import os
 from pathlib import Path
-from typing import Dict
+from typing import Dict, Tuple
 
+import dask
+import dask.array as dsa
 import mlflow
 import numpy as np
-import rasterio as rio
+import rioxarray  # noqa: F401
 import xarray as xr
-from rasterio.warp import reproject, Resampling
+from affine import Affine
+from rasterio.warp import reproject, transform_bounds, Resampling
+from rasterio.windows import Window, from_bounds
+from rasterio.windows import bounds as window_bounds
+from rasterio.windows import transform as window_transform
+
+from satpipe.utils.io import ZARR_CHUNKS, spatial_ref_attrs, write_zarr
 
 __all__ = ["regrid_to_10m"]
 
 logger = logging.getLogger(__name__)
 
+TILE = ZARR_CHUNKS[0]  # destination tile edge – matches the output Zarr chunks
+HALO = 2               # extra source pixels around each tile for the resampling kernel
+INT8_NODATA = -128     # quantised bands use [-127, 127] → -128 marks pixels off the source
+
+
+def _target_grid(ref: xr.DataArray) -> Dict:
+    """Return (transform, width, height, crs) of a 10 m reference band."""
+    return {
+        "transform": ref.rio.transform(),
+        "width": ref.rio.width,
+        "height": ref.rio.height,
+        "crs": ref.rio.crs,
+    }
+
+
+def _source_slice(
+    dst_win: Window, tgt_meta: Dict, src_transform: Affine, src_crs, src_shape: Tuple[int, int]
+) -> Tuple[int, int, int, int]:
+    """Source ``(row0, row1, col0, col1)`` covering `dst_win` plus a halo, clipped."""
+    bounds = window_bounds(dst_win, tgt_meta["transform"])
+    bounds = transform_bounds(tgt_meta["crs"], src_crs, *bounds)
+    win = from_bounds(*bounds, transform=src_transform)
+    row0 = max(math.floor(min(win.row_off, win.row_off + win.height)) - HALO, 0)
+    row1 = min(math.ceil(max(win.row_off, win.row_off + win.height)) + HALO, src_shape[0])
+    col0 = max(math.floor(min(win.col_off, win.col_off + win.width)) - HALO, 0)
+    col1 = min(math.ceil(max(win.col_off, win.col_off + win.width)) + HALO, src_shape[1])
+    return row0, row1, col0, col1
 
-def _target_grid(reference_path: Path) -> Dict:
-    """Return (transform, width, height, crs) from a 10 m reference band."""
-    with rio.open(reference_path) as ref:
-        return {
-            "transform": ref.transform,
-            "width": ref.width,
-            "height": ref.height,
-            "crs": ref.crs,
-        }
+
+def _warp_tile(
+    src: np.ndarray,
+    src_transform: Affine,
+    src_crs,
+    dst_transform: Affine,
+    dst_crs,
+    shape: Tuple[int, int],
+    resampling: Resampling,
+    num_threads: int,
+    dtype: np.dtype = np.dtype(np.float32),
+) -> np.ndarray:
+    dst = np.full(shape, np.nan, dtype=np.float32)
+    reproject(
+        src.astype(np.float32, copy=False),
+        dst,
+        src_transform=src_transform,
+        src_crs=src_crs,
+        dst_transform=dst_transform,
+        dst_crs=dst_crs,
+        dst_nodata=np.nan,
+        resampling=resampling,
+        num_threads=num_threads,
+    )
+    if dtype == np.int8:  # quantised band → back onto the int8 grid, NaN → sentinel
+        return np.where(np.isnan(dst), INT8_NODATA, np.rint(dst)).astype(np.int8)
+    return dst
 
 
 def _reproject_band(
     src_da: xr.DataArray,
     tgt_meta: Dict,
     resampling: Resampling = Resampling.bilinear,
+    num_threads: int = 4,
 ) -> xr.DataArray:
-    """Rasterio-based reprojection → returns an in-memory xarray.DataArray."""
-    dst_arr = np.empty((tgt_meta["height"], tgt_meta["width"]), dtype=np.float32)
-    reproject(
-        src_da.data,
-        dst_arr,
-        src_transform=src_da.rio.transform(),
-        src_crs=src_da.rio.crs,
-        dst_transform=tgt_meta["transform"],
-        dst_crs=tgt_meta["crs"],
-        resampling=resampling,
-        num_threads=4,
-    )
-    out = xr.DataArray(
-        dst_arr,
+    """Tile-wise rasterio reprojection → lazy (dask-backed) xarray.DataArray.
+
+    Each ``TILE × TILE`` destination tile depends only on the source slice it
+    overlaps, so writing the result streams tile-by-tile instead of holding
+    full-size destination arrays.
+
+    int8 (quantised) bands stay int8: tiles are rounded back and pixels outside
+    the source carry ``INT8_NODATA`` (recorded in the ``nodata`` attr), while
+    the ``scale`` attr is kept for dequantisation.
+    """
+    src_transform, src_crs = src_da.rio.transform(), src_da.rio.crs
+    dtype = np.dtype(np.int8 if src_da.dtype == np.int8 else np.float32)
+    fill = INT8_NODATA if dtype == np.int8 else np.nan
+    attrs = dict(src_da.attrs, nodata=INT8_NODATA) if dtype == np.int8 else src_da.attrs
+    height, width = tgt_meta["height"], tgt_meta["width"]
+
+    rows = []
+    for row in range(0, height, TILE):
+        tiles = []
+        for col in range(0, width, TILE):
+            win = Window(col, row, min(TILE, width - col), min(TILE, height - row))
+            shape = (win.height, win.width)
+            r0, r1, c0, c1 = _source_slice(win, tgt_meta, src_transform, src_crs, src_da.shape)
+            if r1 <= r0 or c1 <= c0:  # tile lies outside the source footprint
+                tiles.append(dsa.full(shape, fill, dtype=dtype))
+                continue
+            tile = dask.delayed(_warp_tile)(
+                src_da.data[r0:r1, c0:c1],
+                src_transform * Affine.translation(c0, r0),
+                src_crs,
+                window_transform(win, tgt_meta["transform"]),
+                tgt_meta["crs"],
+                shape,
+                resampling,
+                num_threads,
+                dtype,
+            )
+            tiles.append(dsa.from_delayed(tile, shape=shape, dtype=dtype))
+        rows.append(tiles)
+
+    spatial_ref = xr.DataArray(0, attrs=spatial_ref_attrs(tgt_meta["crs"], tgt_meta["transform"]))
+    return xr.DataArray(
+        dsa.block(rows),
         dims=("y", "x"),
-        attrs=src_da.attrs | {"transform": tgt_meta["transform"], "crs": tgt_meta["crs"]},
+        coords={"spatial_ref": spatial_ref},
+        attrs=attrs,
     )
-    return out
 
 
 def regrid_to_10m(
     src_zarr: Path | str,
     dst_zarr: Path | str,
     reference_band: str = "B04",
+    consolidated: bool = False,
     **mlflow_tags: str,
 ) -> Path:
     """
     Upsample **all** bands to the 10 m grid defined by `reference_band`.
 
+    int8 (quantised) bands stay int8 with their ``scale`` attr; see
+    :func:`_reproject_band`.
+
     Parameters
     ----------
     src_zarr
@@ -71,25 +160,30 @@ def regrid_to_10m(
         Aligned output Zarr (`data/processed/aligned/*.zarr`).
     reference_band
         A 10 m band to derive the target geospatial grid (B02, B03, B04, B08).
+    consolidated
+        Write consolidated metadata (see ``satpipe consolidate``).
     """
     src_zarr, dst_zarr = Path(src_zarr), Path(dst_zarr)
     with mlflow.start_run(run_name="align_regrid_10m"):
         mlflow.log_param("reference_band", reference_band)
         mlflow.set_tags(mlflow_tags)
 
-        ds = xr.open_zarr(src_zarr, consolidated=True)
-        ref_da = ds[reference_band]
-        tgt_meta = _target_grid(ref_da.encoding["source"])
+        ds = xr.open_zarr(src_zarr, consolidated=False)
+        tgt_meta = _target_grid(ds[reference_band])
 
-        aligned = xr.merge(
+        # Tiles are the unit of parallelism and run on whatever scheduler is
+        # active; each GDAL warp gets the cores left over by dask's pool
+        # (1 with the default pool) so dask × GDAL threads stay within cpu_count.
+        cpus = os.cpu_count() or 1
+        warp_threads = max(1, cpus // (dask.config.get("num_workers", None) or cpus))
+        aligned = xr.Dataset(
             {
-                band: _reproject_band(da, tgt_meta, Resampling.bilinear)
+                band: _reproject_band(da, tgt_meta, Resampling.bilinear, warp_threads)
                 for band, da in ds.data_vars.items()
             },
-            compat="override",
-            combine_attrs="override",
+            attrs=ds.attrs,
         )
-        aligned.to_zarr(dst_zarr, mode="w", consolidated=True)
+        write_zarr(aligned, dst_zarr, consolidated=consolidated)
         mlflow.log_metric("n_bands", len(ds.data_vars))
         mlflow.log_metric("out_shape_y", tgt_meta["height"])
         mlflow.log_metric("out_shape_x", tgt_meta["width"])
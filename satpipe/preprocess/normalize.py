@@ -3,20 +3,84 @@
 
 from __future__ import annotations
 
+import functools
 import logging
 import math
 import os
 from pathlib import Path
 from typing import Dict, Literal, Tuple
 
+import dask
 import mlflow
+import numba
 import numpy as np
 import xarray as xr
 
+from satpipe.utils.io import write_zarr
+
 __all__ = ["Normaliser", "compute_stats", "normalise_zarr"]
 
 logger = logging.getLogger(__name__)
 _TStat = Tuple[float, float]  # (mean, std)
+_F32_MAX = float(np.finfo(np.float32).max)  # "no clip" bound – fastmath assumes finite
+
+
+def _affine_clip(src, offset, scale, lo, hi, out):
+    """``out[b] = clip((src[b] - offset[b]) * scale[b], lo, hi)`` in one fused pass."""
+    for b in range(src.shape[0]):
+        for i in numba.prange(src.shape[1]):
+            v = (src[b, i] - offset[b]) * scale[b]
+            out[b, i] = min(max(v, lo), hi)
+
+
+def _affine_clip_round(src, offset, scale, lo, hi, out):
+    """Same as :func:`_affine_clip`, rounded to the nearest integer of ``out``."""
+    for b in range(src.shape[0]):
+        for i in numba.prange(src.shape[1]):
+            v = (src[b, i] - offset[b]) * scale[b]
+            out[b, i] = math.floor(min(max(v, lo), hi) + 0.5)
+
+
+@functools.lru_cache(maxsize=None)
+def _kernel(src_dtype: np.dtype, out_dtype: np.dtype):
+    """Kernel compiled eagerly for one ``(src, out)`` dtype pair.
+
+    The explicit C-contiguous signature means numba compiles (or loads from its
+    on-disk cache) once per pair up front and skips type dispatch per chunk.
+    """
+    py_func = _affine_clip_round if out_dtype == np.int8 else _affine_clip
+    f32 = numba.float32
+    sig = numba.void(
+        numba.from_dtype(src_dtype)[:, ::1],
+        f32[::1],
+        f32[::1],
+        f32,
+        f32,
+        numba.from_dtype(out_dtype)[:, ::1],
+    )
+    return numba.njit(sig, parallel=True, fastmath=True, cache=True)(py_func)
+
+
+def _normalise_block(
+    block: np.ndarray,
+    offset: np.ndarray,
+    scale: np.ndarray,
+    lo: float,
+    hi: float,
+    quant: float | None = None,
+) -> np.ndarray:
+    """Apply the fused kernel to a (band-major) block → float32 | int8.
+
+    ``block`` is either one band or a ``(band, y, x)`` stack whose leading axis
+    matches ``offset``/``scale``. With ``quant`` set, values are multiplied by
+    it and rounded to int8.
+    """
+    src = np.ascontiguousarray(block).reshape(offset.size, -1)
+    out = np.empty(src.shape, dtype=np.float32 if quant is None else np.int8)
+    if quant is not None:
+        scale, lo, hi = scale * np.float32(quant), lo * quant, hi * quant
+    _kernel(src.dtype, out.dtype)(src, offset, scale, np.float32(lo), np.float32(hi), out)
+    return out.reshape(block.shape)
 
 
 class Normaliser:
@@ -27,6 +91,7 @@ class Normaliser:
         stats: Dict[str, _TStat],
         mode: Literal["zscore", "minmax"] = "zscore",
         clip_sigma: float | None = 3.0,
+        dtype: Literal["float32", "int8"] = "float32",
     ) -> None:
         """
         Parameters
@@ -37,29 +102,75 @@ class Normaliser:
             ``"zscore"`` or ``"minmax"`` normalisation.
         clip_sigma
             Optionally clip extreme values (``None`` disables).
+        dtype
+            ``"int8"`` quantises the clipped range onto ``[-127, 127]``; the
+            per-band dequantisation factor is stored in the ``scale`` attr.
         """
+        if dtype == "int8" and mode == "zscore" and clip_sigma is None:
+            raise ValueError("int8 output needs a finite clip_sigma")
         self.stats = stats
         self.mode = mode
         self.clip_sigma = clip_sigma
+        self.dtype = dtype
 
-    def _transform_band(self, arr: xr.DataArray, band: str) -> xr.DataArray:
-        mean, spread = self.stats[band]
+    def _bounds(self) -> Tuple[float, float]:
         if self.mode == "zscore":
-            out = (arr - mean) / spread
-            if self.clip_sigma is not None:
-                out = out.clip(min=-self.clip_sigma, max=self.clip_sigma)
-        else:  # minmax
-            out = (arr - mean) / spread  # spread == max-min
-            out = out.clip(0.0, 1.0)
-        return out.astype(np.float32)
+            bound = _F32_MAX if self.clip_sigma is None else self.clip_sigma
+            return -bound, bound
+        return 0.0, 1.0  # minmax – spread == max-min
+
+    def _quant(self) -> float | None:
+        """Multiplier onto the int8 grid (``None`` for float32 output)."""
+        if self.dtype != "int8":
+            return None
+        return 127.0 / max(abs(b) for b in self._bounds())
+
+    def _apply(self, arr: xr.DataArray, bands: list[str]) -> xr.DataArray:
+        offset = np.array([self.stats[b][0] for b in bands], dtype=np.float32)
+        scale = (1.0 / np.array([self.stats[b][1] for b in bands])).astype(np.float32)
+        lo, hi = self._bounds()
+        _kernel(np.dtype(arr.dtype), np.dtype(self.dtype))  # compile once, outside the workers
+        return xr.apply_ufunc(
+            _normalise_block,
+            arr,
+            kwargs={
+                "offset": offset, "scale": scale, "lo": lo, "hi": hi, "quant": self._quant(),
+            },
+            dask="parallelized",
+            output_dtypes=[np.dtype(self.dtype)],
+        )
+
+    def _with_scale(self, da: xr.DataArray) -> xr.DataArray:
+        quant = self._quant()
+        return da if quant is None else da.assign_attrs(scale=1.0 / quant)
+
+    def _transform_band(self, arr: xr.DataArray, band: str) -> xr.DataArray:
+        return self._with_scale(self._apply(arr, [band]))
 
     def __call__(self, ds: xr.Dataset) -> xr.Dataset:
         """Return a *new* ``xarray.Dataset`` with all bands normalised."""
-        return xr.merge(
-            {b: self._transform_band(ds[b], b) for b in ds.data_vars},
-            compat="override",
-            combine_attrs="override",
-        )
+        # Dims/coords are unchanged → assign into a shallow copy, no merge needed.
+        out = ds.copy()
+        bands = list(ds.data_vars)
+        if len({ds[b].dims for b in bands}) > 1:  # not on a common grid → per band
+            for b in bands:
+                out[b] = self._transform_band(ds[b], b)
+            return out
+
+        # Same grid → one (band, y, x) stack, one fused pass with per-band vectors
+        stacked = ds.to_dataarray("band")
+        if stacked.chunks is not None:
+            stacked = stacked.chunk(band=-1)
+        normed = self._apply(stacked, bands)
+        for i, b in enumerate(bands):
+            out[b] = self._with_scale(normed[i].drop_vars("band"))
+        return out
+
+
+def _moments(block: np.ndarray) -> np.ndarray:
+    """Return ``[Σx, Σx², n]`` for one chunk using float64 accumulators."""
+    block = block.astype(np.float64, copy=False)
+    return np.array([block.sum(), np.square(block).sum(), block.size], dtype=np.float64)
 
 
 # --------------------------------------------------------------------------- #
@@ -73,14 +184,18 @@ def compute_stats(
     rng_seed: int = 42,
 ) -> Dict[str, _TStat]:
     """
-    Compute per-band mean & std **or** (min, range) on a random sample of pixels.
+    Compute per-band mean & std **or** (min, range) on a random sample of chunks.
+
+    Only the sampled Zarr chunks are read and decompressed – the full band is
+    never materialised.
 
     Parameters
     ----------
     zarr_path
         Location of **raw** Sentinel-2 Zarr store (`data/raw/msi/...`).
     sample_frac
-        Fraction of pixels to sample (default ≈ 2 % more than enough).
+        Fraction of chunks to sample (default ≈ 2 %, at least one; the same
+        chunks are used for every band).
     rng_seed
         For reproducibility.
 
@@ -90,14 +205,29 @@ def compute_stats(
         ``band → (mean, std)`` suitable for :class:`Normaliser`.
     """
     rng = np.random.default_rng(rng_seed)
-    ds = xr.open_zarr(zarr_path, consolidated=True)
+    ds = xr.open_zarr(zarr_path, consolidated=False, chunks={})
+
+    # Bands share one grid → draw the chunk indices once so every band's stats
+    # come from the same tiles.
+    numblocks = next(iter(ds.data_vars.values())).data.numblocks
+    n_chunks = math.prod(numblocks)
+    k = max(1, math.ceil(sample_frac * n_chunks))
+    chosen = rng.choice(n_chunks, size=k, replace=False)
 
     stats: Dict[str, _TStat] = {}
     for band, da in ds.data_vars.items():
-        flat = da.data.reshape(-1)
-        n = max(1, int(sample_frac * flat.size))
-        sample = rng.choice(flat, size=n, replace=False)
-        stats[band] = (float(sample.mean()), float(sample.std()))
+        arr = da.data
+        # One pass per sampled chunk: (Σx, Σx², n) are reduced, never the pixels.
+        s, sq, n = sum(
+            dask.compute(
+                *(
+                    dask.delayed(_moments)(arr.blocks[np.unravel_index(i, numblocks)])
+                    for i in chosen
+                )
+            )
+        )
+        mean = s / n
+        stats[band] = (float(mean), math.sqrt(max(sq / n - mean**2, 0.0)))
         logger.debug("Stats[%s] – μ=%.3f σ=%.3f (n=%d)", band, *stats[band], n)
 
     ds.close()
@@ -109,6 +239,8 @@ def normalise_zarr(
     dst: Path | str,
     stats: Dict[str, _TStat] | None = None,
     mode: Literal["zscore", "minmax"] = "zscore",
+    dtype: Literal["float32", "int8"] = "float32",
+    consolidated: bool = False,
     **mlflow_tags: str,
 ) -> Path:
     """
@@ -126,6 +258,11 @@ def normalise_zarr(
         Pre-computed stats (``None`` → compute on-the-fly on `src`).
     mode
         Normalisation strategy.
+    dtype
+        Output dtype; ``"int8"`` stores quantised values (see :class:`Normaliser`).
+    consolidated
+        Write consolidated metadata. Off by default – consolidate once after
+        the final stage (``satpipe consolidate``).
     **mlflow_tags
         Extra run tags (e.g. commit SHA, dataset version).
     """
@@ -135,6 +272,7 @@ def normalise_zarr(
 
     with mlflow.start_run(run_name="normalise_zarr"):
         mlflow.log_param("mode", mode)
+        mlflow.log_param("dtype", dtype)
         mlflow.set_tags(mlflow_tags)
 
         if stats is None:
@@ -148,21 +286,26 @@ def normalise_zarr(
             mlflow.log_metric(f"{b}_mean_raw", mu)
             mlflow.log_metric(f"{b}_std_raw", sigma)
 
-        norm = Normaliser(stats, mode=mode)
+        norm = Normaliser(stats, mode=mode, dtype=dtype)
         logger.info("Loading raw Zarr %s …", src)
-        ds = xr.open_zarr(src, consolidated=True, chunks="auto")
+        ds = xr.open_zarr(src, consolidated=False, chunks={})
         logger.info("Normalising …")
         out = norm(ds)
 
         logger.info("Writing processed Zarr → %s", dst)
-        out.to_zarr(dst, mode="w", consolidated=True)
-        ds.close()
-        out.close()
-
-        # Verify numeric integrity & log quick sanity metric.
+        # Sanity metric shares the write's graph → each chunk is read & normalised
+        # once. Graph optimisation is off because it fuses the store and the
+        # reduction into separate chains that each recompute the normalised blocks.
         example_band = next(iter(stats))
-        max_abs = float(np.abs(xr.open_zarr(dst)[example_band]).max())
+        write = write_zarr(out, dst, compute=False, consolidated=consolidated)
+        _, max_abs = dask.compute(
+            write, np.abs(out[example_band]).max(), optimize_graph=False
+        )
+        # int8 stores quantised values – dequantise so the metric is dtype-independent
+        max_abs = float(max_abs) * out[example_band].attrs.get("scale", 1.0)
         mlflow.log_metric("max_abs_after_norm", max_abs)
+        ds.close()
+        out.close()
 
     logger.info("Normalised dataset stored at %s (track with DVC)", dst)
     return dst
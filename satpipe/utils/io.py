@@ -1,12 +1,128 @@
 # satpipe/utils/io.py
 
 import hashlib
+import numpy as np
+import rioxarray  # noqa: F401  (registers the .rio accessor)
 import xarray as xr
+import xxhash
+import zarr
+from rasterio.windows import Window
+from zarr.codecs import BloscCodec
 
-def compute_scene_hash(dataset: xr.Dataset) -> str:
+ZARR_CHUNKS = (1024, 1024)  # (y, x) – ~2-4 MB per chunk for uint16/float32
+ZARR_COMPRESSOR = BloscCodec(cname="zstd", clevel=3, shuffle="bitshuffle")
+
+def spatial_ref_attrs(crs, transform, gcps=None) -> dict:
+    """Attributes of rioxarray's ``spatial_ref`` grid-mapping variable.
+
+    CRS + GeoTransform, or – for GCP-referenced rasters such as Sentinel-1 GRD –
+    the ``(points, crs)`` pair from rasterio's ``src.gcps``. A missing CRS
+    leaves just the GeoTransform.
+    """
+    grid = xr.Dataset()
+    if gcps and gcps[0] and gcps[1] is not None:
+        return dict(grid.rio.write_gcps(*gcps)["spatial_ref"].attrs)
+    if crs is not None:
+        grid = grid.rio.write_crs(crs)
+    return dict(grid.rio.write_transform(transform)["spatial_ref"].attrs)
+
+def _data_digest(var: xr.DataArray) -> bytes:
+    """xxh128 of the array bytes, fed one ZARR_CHUNKS-row slab at a time."""
+    h = xxhash.xxh128(var.dtype.str.encode())
+    if var.ndim == 0:
+        h.update(np.ascontiguousarray(var.values))
+        return h.digest()
+    rows = ZARR_CHUNKS[0]
+    for i in range(0, var.shape[0], rows):
+        h.update(np.ascontiguousarray(var.isel({var.dims[0]: slice(i, i + rows)}).values))
+    return h.digest()
+
+def compute_scene_hash(dataset: xr.Dataset, include_data: bool = False) -> str:
+    """SHA-256 over scene id + dims; `include_data` also folds in per-variable xxh128 digests."""
     meta = dataset.attrs.get("scene_id", "") + str(dataset.dims)
-    return hashlib.sha256(meta.encode()).hexdigest()
+    h = hashlib.sha256(meta.encode())
+    if include_data:
+        for name in sorted(dataset.data_vars):
+            h.update(str(name).encode())
+            h.update(_data_digest(dataset[name]))
+    return h.hexdigest()
+
+def zarr_encoding(dataset: xr.Dataset) -> dict:
+    """Blosc+Zstd (bitshuffle) for every variable, ZARR_CHUNKS tiles for 2-D rasters."""
+    encoding = {}
+    for name, var in dataset.data_vars.items():
+        encoding[name] = {"compressors": (ZARR_COMPRESSOR,)}
+        if var.ndim == 2:
+            encoding[name]["chunks"] = tuple(min(c, n) for c, n in zip(ZARR_CHUNKS, var.shape))
+    return encoding
 
-def write_zarr(dataset: xr.Dataset, zarr_path: str):
+def write_zarr(
+    dataset: xr.Dataset,
+    zarr_path: str,
+    compute: bool = True,
+    consolidated: bool = False,
+):
     dataset.attrs["hash"] = compute_scene_hash(dataset)
-    dataset.to_zarr(zarr_path, mode="w", consolidated=True)
+    # dask chunks must line up with the Zarr chunks they are written into
+    dataset = dataset.map(
+        lambda v: v.chunk(dict(zip(v.dims, ZARR_CHUNKS))) if v.chunks and v.ndim == 2 else v,
+        keep_attrs=True,
+    )
+    return dataset.to_zarr(
+        zarr_path,
+        mode="w",
+        consolidated=consolidated,
+        encoding=zarr_encoding(dataset),
+        compute=compute,
+    )
+
+def create_raster_store(zarr_path: str, crs, transform, gcps=None) -> zarr.Group:
+    """Fresh Zarr group holding only the `spatial_ref` grid mapping (see spatial_ref_attrs)."""
+    store = zarr.open_group(zarr_path, mode="w")
+    store.create_array(
+        "spatial_ref",
+        shape=(),
+        dtype="int64",
+        fill_value=0,
+        dimension_names=(),
+        attributes=spatial_ref_attrs(crs, transform, gcps),
+    )
+    return store
+
+def create_band(store: zarr.Group, name: str, shape: tuple, dtype) -> zarr.Array:
+    """Empty (y, x) band on the standard chunk grid, tied to `spatial_ref`."""
+    return store.create_array(
+        name,
+        shape=shape,
+        chunks=ZARR_CHUNKS,
+        dtype=dtype,
+        compressors=ZARR_COMPRESSOR,
+        fill_value=0,
+        dimension_names=("y", "x"),
+        attributes={"grid_mapping": "spatial_ref", "coordinates": "spatial_ref"},
+    )
+
+def copy_windowed(src, dst: zarr.Array) -> None:
+    """Copy band 1 of `src` into `dst` one Zarr chunk at a time."""
+    (height, width), (ch_y, ch_x) = dst.shape, dst.chunks
+    for row in range(0, height, ch_y):
+        for col in range(0, width, ch_x):
+            win = Window(col, row, min(ch_x, width - col), min(ch_y, height - row))
+            dst[row:row + win.height, col:col + win.width] = src.read(1, window=win)
+
+def finalise_raster_store(
+    store: zarr.Group,
+    zarr_path: str,
+    scene_id: str,
+    consolidated: bool = False,
+    hash_data: bool = False,
+):
+    """Stamp scene id + hash on a store filled via copy_windowed; optionally consolidate.
+
+    `hash_data` folds the band contents into the hash, read back slab-by-slab from disk.
+    """
+    store.attrs["scene_id"] = scene_id
+    with xr.open_zarr(zarr_path, consolidated=False) as ds:
+        store.attrs["hash"] = compute_scene_hash(ds, include_data=hash_data)
+    if consolidated:
+        zarr.consolidate_metadata(zarr_path)
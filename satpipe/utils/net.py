@@ -0,0 +1,113 @@
+# satpipe/utils/net.py
+"""HTTP helpers shared by the ingestors: parallel range downloads and COG probing."""
+
+from __future__ import annotations
+
+import os
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import rasterio
+import requests
+from rasterio.errors import RasterioIOError
+from requests.adapters import HTTPAdapter
+from tqdm import tqdm
+
+# GDAL options for reading COG tiles over HTTP without a local copy
+COG_ENV = {
+    "GDAL_DISABLE_READDIR_ON_OPEN": "EMPTY_DIR",
+    "CPL_VSIL_CURL_ALLOWED_EXTENSIONS": ".tif,.tiff",
+    "GDAL_HTTP_MULTIPLEX": "YES",
+    "VSI_CACHE": "TRUE",
+    "VSI_CACHE_SIZE": str(64 * 1024**2),   # per open file – a few chunk rows of a COG
+}
+
+RANGE_PARTS = 8                        # parallel byte-range GETs per asset
+RANGE_MIN_SIZE = 16 * 1024**2          # smaller assets use a single stream
+
+
+class _RangeNotSupported(Exception):
+    """Server answered a Range request with the full body (HTTP 200)."""
+
+
+def http_session(pool_size: int = 8) -> requests.Session:
+    """HTTP session whose connection pool is shared by the download threads."""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def _fetch_range(http, url: str, fd: int, lo: int, hi: int, bar: tqdm) -> None:
+    r = http.get(url, headers={"Range": f"bytes={lo}-{hi}"}, stream=True, timeout=60)
+    r.raise_for_status()
+    if r.status_code != 206:
+        r.close()
+        raise _RangeNotSupported(url)
+    offset = lo
+    for chunk in r.iter_content(chunk_size=1 << 16):
+        os.pwrite(fd, chunk, offset)          # positional write → no shared seek
+        offset += len(chunk)
+        bar.update(len(chunk))
+
+
+def _download_ranges(http, url: str, dst: str, total: int, bar: tqdm) -> None:
+    """Fetch `url` as RANGE_PARTS concurrent byte ranges into a preallocated file."""
+    step = -(-total // RANGE_PARTS)
+    fd = os.open(dst, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+    try:
+        os.ftruncate(fd, total)
+        with ThreadPoolExecutor(max_workers=RANGE_PARTS) as ex:
+            futures = [
+                ex.submit(_fetch_range, http, url, fd, lo, min(lo + step, total) - 1, bar)
+                for lo in range(0, total, step)
+            ]
+            for f in as_completed(futures):
+                f.result()
+    finally:
+        os.close(fd)
+
+
+def _download_stream(http, url: str, dst: str, bar: tqdm) -> None:
+    r = http.get(url, stream=True, timeout=60)
+    r.raise_for_status()
+    with open(dst, "wb") as f:
+        for chunk in r.iter_content(chunk_size=8192):
+            f.write(chunk)
+            bar.update(len(chunk))
+
+
+def download(url: str, dst: str, desc: str, session: requests.Session | None = None) -> None:
+    http = session or requests
+    # HEAD is only a probe for ranged downloads; servers that refuse it (405, or
+    # 403 on presigned/GET-only S3 URLs) or omit the size get a plain GET.
+    head = http.head(url, allow_redirects=True, timeout=60)
+    total = int(head.headers.get("content-length", 0)) if head.ok else 0
+    ranged = (
+        total >= RANGE_MIN_SIZE
+        and head.headers.get("accept-ranges", "").lower() == "bytes"
+    )
+
+    with tqdm(
+        total=total, unit="B", unit_scale=True, unit_divisor=1024,
+        desc=desc, leave=False
+    ) as bar:
+        if ranged:
+            try:
+                _download_ranges(http, url, dst, total, bar)
+                return
+            except _RangeNotSupported:
+                bar.reset()
+        _download_stream(http, url, dst, bar)
+
+
+def is_streamable_cog(url: str, session: requests.Session | None = None) -> bool:
+    """True if `url` serves byte ranges and is a tiled GeoTIFF (readable via /vsicurl/)."""
+    head = (session or requests).head(url, allow_redirects=True, timeout=60)
+    if not head.ok or head.headers.get("accept-ranges", "").lower() != "bytes":
+        return False
+    try:
+        with rasterio.Env(**COG_ENV), rasterio.open(f"/vsicurl/{url}") as src:
+            return bool(src.profile.get("tiled", False))
+    except RasterioIOError:
+        return False
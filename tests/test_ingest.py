@@ -0,0 +1,46 @@
+import numpy as np
+import rasterio
+import xarray as xr
+from rasterio.control import GroundControlPoint
+
+from satpipe.ingest.sar import SARIngestor
+
+
+def _write_tiff(path, data, **profile):
+    with rasterio.open(
+        path, "w", driver="GTiff", width=data.shape[1], height=data.shape[0],
+        count=1, dtype=data.dtype, **profile,
+    ) as dst:
+        dst.write(data, 1)
+
+
+def test_sar_to_zarr_without_crs(tmp_path):
+    data = np.arange(300 * 200, dtype="uint16").reshape(300, 200)
+    src = tmp_path / "VH.tif"
+    _write_tiff(src, data)
+
+    dst = tmp_path / "sar.zarr"
+    SARIngestor().to_zarr({"scene_id": "S1", "files": {"VH": str(src)}}, str(dst))
+
+    ds = xr.open_zarr(dst, consolidated=False)
+    np.testing.assert_array_equal(ds["VH"].values, data)
+    assert ds["VH"].rio.crs is None
+
+
+def test_sar_to_zarr_keeps_gcps(tmp_path):
+    data = np.ones((300, 200), dtype="uint16")
+    gcps = [
+        GroundControlPoint(row=0, col=0, x=26.0, y=1.0),
+        GroundControlPoint(row=0, col=200, x=26.2, y=1.0),
+        GroundControlPoint(row=300, col=0, x=26.0, y=0.7),
+    ]
+    src = tmp_path / "VH.tif"
+    _write_tiff(src, data, gcps=gcps, crs="EPSG:4326")
+
+    dst = tmp_path / "sar.zarr"
+    SARIngestor().to_zarr({"scene_id": "S1", "files": {"VH": str(src)}}, str(dst))
+
+    ds = xr.open_zarr(dst, consolidated=False)
+    np.testing.assert_array_equal(ds["VH"].values, data)
+    assert len(ds["VH"].rio.get_gcps()) == len(gcps)
+    assert ds["VH"].rio.crs == "EPSG:4326"